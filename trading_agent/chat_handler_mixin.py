@@ -11,10 +11,55 @@ import asyncio
 import logging
 import re
 import time
-from typing import Optional, Dict, List, Any, Callable
+from collections import deque
+from typing import Deque, Optional, Dict, List, Any, Callable
 
 from .intent_parser import IntentParser, IntentType, ParsedIntent
 
+# Быстрый префильтр: сообщение без этих маркеров — чистый чат,
+# его не нужно гонять через IntentParser (уйдёт в grid/LLM fallback)
+_TRIGGER_CHARS = frozenset("$0123456789")
+
+
+def _keyword_stems(*keyword_lists: List[str]) -> tuple:
+    """
+    Строит литеральные подстроки-триггеры из regex-ключей парсера.
+
+    От каждого ключа берётся префикс до первого метасимвола
+    ('куп[ий]' -> 'куп', 'доведи.*до' -> 'доведи'); слишком короткие
+    префиксы (< 3 символов, например 'до' из 'до.*каждой') отбрасываются,
+    чтобы префильтр не срабатывал на каждом втором слове. Вывод из таблиц
+    парсера гарантирует, что префильтр не разойдётся с IntentParser при
+    добавлении новых ключевых слов.
+    """
+    stems = []
+    for kw in keyword_lists:
+        for pattern in kw:
+            stem = re.split(r"[\[\].*+?()\\|]", pattern, 1)[0]
+            if len(stem) >= 3:
+                stems.append(stem)
+    return tuple(dict.fromkeys(stems))
+
+
+_TRIGGER_SUBS = _keyword_stems(
+    IntentParser.BUY_KEYWORDS,
+    IntentParser.SELL_KEYWORDS,
+    IntentParser.REBALANCE_KEYWORDS,
+    IntentParser.BALANCE_KEYWORDS,
+)
+# CAPS-токены (возможные тикеры) тоже считаем триггером
+_CAPS_RE = re.compile(r"[A-Z]{2}")
+
+# Grid-команды: одна скомпилированная альтернация вместо списка
+# сырых паттернов, прогоняемых re.search по очереди
+_GRID_RE = re.compile(
+    r'грид|сетк|распредел.*монет'
+    r'|low\s*risk|mrisk|lrisk|hrisk'
+    r'|сделай.*по.*доллар|поставь.*монет'
+)
+_GRID_DAYS_RE = re.compile(r'(\d+)\s*(?:дней|дня|день|days?)')
+_GRID_AMOUNT_RE = re.compile(r'\$?(\d+(?:\.\d+)?)')
+
 
 class DialogContext:
     """
@@ -24,19 +69,25 @@ class DialogContext:
     типа "да, именно эти" или "добавь ещё SOL".
     """
 
+    __slots__ = (
+        "history", "max_history", "context_ttl",
+        "pending_action", "last_intent", "last_intent_ts",
+    )
+
     def __init__(self, max_history: int = 20, context_ttl: int = 300):
         """
         Args:
             max_history: Максимум сообщений в истории
             context_ttl: Время жизни контекста в секундах
         """
-        self.history: List[Dict] = []
+        self.history: Deque[Dict] = deque(maxlen=max_history)
         self.max_history = max_history
         self.context_ttl = context_ttl
 
         # Pending состояния
         self.pending_action: Optional[Dict] = None
         self.last_intent: Optional[ParsedIntent] = None
+        self.last_intent_ts: float = 0.0
 
     def add_message(self, role: str, text: str, intent: Optional[ParsedIntent] = None):
         """Добавляет сообщение в историю."""
@@ -49,10 +100,7 @@ class DialogContext:
 
         if intent:
             self.last_intent = intent
-
-        # Обрезаем историю
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+            self.last_intent_ts = time.time()
 
     def get_recent_symbols(self, lookback_seconds: int = 300) -> List[str]:
         """
@@ -74,16 +122,12 @@ class DialogContext:
         return list(dict.fromkeys(symbols))  # Unique, preserve order
 
     def get_last_intent(self) -> Optional[ParsedIntent]:
-        """Возвращает последнее распознанное намерение."""
+        """Возвращает последнее распознанное намерение (с учётом TTL)."""
         if not self.last_intent:
             return None
 
-        # Проверяем TTL
-        for msg in reversed(self.history):
-            if msg.get("intent") == self.last_intent:
-                if time.time() - msg["timestamp"] < self.context_ttl:
-                    return self.last_intent
-                break
+        if time.time() - self.last_intent_ts < self.context_ttl:
+            return self.last_intent
 
         return None
 
@@ -124,6 +168,15 @@ class SmartChatHandler:
         response = await handler.process_message(text)
     """
 
+    # Константы подтверждения/отмены: один frozenset на класс вместо
+    # set-литерала, пересоздаваемого на каждое сообщение
+    _CONFIRM_WORDS = frozenset({"да", "yes", "подтвердить", "confirm", "ок", "ok", "делай", "go"})
+    _CANCEL_WORDS = frozenset({"нет", "no", "отмена", "cancel", "стоп", "stop"})
+
+    # Слова уровней риска для _check_grid_command (substring-скан)
+    _LOW_RISK_WORDS = ('low', 'lrisk', 'консерватив', 'низк')
+    _HIGH_RISK_WORDS = ('high', 'hrisk', 'агрессив', 'высок')
+
     def __init__(
         self,
         execute_batch_buy: Callable[[List[str], float, bool], str],
@@ -133,6 +186,7 @@ class SmartChatHandler:
         llm_client: Optional[Any] = None,
         grid_ai_analyze: Optional[Callable] = None,
         grid_ai_format: Optional[Callable] = None,
+        get_position_values: Optional[Callable[[List[str]], Dict[str, float]]] = None,
     ):
         """
         Args:
@@ -143,10 +197,12 @@ class SmartChatHandler:
             llm_client: LLM клиент для fallback
             grid_ai_analyze: Функция Grid AI анализа
             grid_ai_format: Функция форматирования Grid AI
+            get_position_values: Батч-вариант get_position_value (опционально)
         """
         self.execute_batch_buy = execute_batch_buy
         self.execute_quick_order = execute_quick_order
         self.get_position_value = get_position_value
+        self.get_position_values = get_position_values
         self.refresh_positions = refresh_positions
         self.llm_client = llm_client
         self.grid_ai_analyze = grid_ai_analyze
@@ -156,6 +212,13 @@ class SmartChatHandler:
         self.context = DialogContext()
         self.logger = logging.getLogger(__name__)
 
+    def _fetch_position_values(self, symbols: List[str]) -> Dict[str, float]:
+        """Стоимости позиций одним батчем (нормализует символы к _USDT)."""
+        normalized = [s if "_USDT" in s else f"{s}_USDT" for s in symbols]
+        if self.get_position_values:
+            return self.get_position_values(normalized)
+        return {s: self.get_position_value(s) for s in normalized}
+
     async def process_message(self, text: str) -> Optional[str]:
         """
         Обрабатывает сообщение и возвращает ответ.
@@ -174,6 +237,15 @@ class SmartChatHandler:
         if pending_response:
             return pending_response
 
+        # Шаг 0.5: Дешёвый префильтр — без цифр/$, торговых слов и
+        # CAPS-тикеров это не торговая команда, парсер не нужен
+        if (
+            not any(c in _TRIGGER_CHARS for c in lower)
+            and not any(s in lower for s in _TRIGGER_SUBS)
+            and not _CAPS_RE.search(normalized)
+        ):
+            return self._check_grid_command(lower)
+
         # Шаг 1: Парсим намерение
         intent = self.intent_parser.parse(text)
         self.context.add_message("user", text, intent)
@@ -209,7 +281,7 @@ class SmartChatHandler:
             return None
 
         # Подтверждение
-        if text in {"да", "yes", "подтвердить", "confirm", "ок", "ok", "делай", "go"}:
+        if text in self._CONFIRM_WORDS:
             action = pending["action"]
             self.context.clear_pending()
 
@@ -223,7 +295,7 @@ class SmartChatHandler:
             return f"✅ Подтверждено: {action}"
 
         # Отмена
-        if text in {"нет", "no", "отмена", "cancel", "стоп", "stop"}:
+        if text in self._CANCEL_WORDS:
             self.context.clear_pending()
             return "🚫 Действие отменено"
 
@@ -283,19 +355,19 @@ class SmartChatHandler:
         # Обновляем позиции
         self.refresh_positions()
 
-        # Показываем текущее состояние
-        lines = ["📊 **Rebalance Preview:**", ""]
+        # Показываем текущее состояние: строка докупки форматируется
+        # только когда она действительно нужна
+        values = self._fetch_position_values(symbols)
 
-        for symbol in symbols:
-            current = self.get_position_value(f"{symbol}_USDT")
-            to_buy = max(0, amount - current)
-            status = "✅" if current >= amount else f"➡️ +${to_buy:.2f}"
-            lines.append(f"• {symbol}: ${current:.2f} → ${amount:.2f} {status}")
-
-        lines.extend([
-            "",
-            "**Выполнить?** (да/нет)",
-        ])
+        def preview_lines():
+            yield "📊 **Rebalance Preview:**"
+            yield ""
+            for symbol in symbols:
+                current = values[f"{symbol}_USDT"]
+                status = "✅" if current >= amount else f"➡️ +${amount - current:.2f}"
+                yield f"• {symbol}: ${current:.2f} → ${amount:.2f} {status}"
+            yield ""
+            yield "**Выполнить?** (да/нет)"
 
         self.context.set_pending_action({
             "action": "batch_buy",
@@ -304,7 +376,7 @@ class SmartChatHandler:
             "rebalance": True,
         })
 
-        return "\n".join(lines)
+        return "\n".join(preview_lines())
 
     def _handle_sell(self, intent: ParsedIntent) -> str:
         """Обработка продажи."""
@@ -325,10 +397,10 @@ class SmartChatHandler:
 
         if intent.symbols:
             # Конкретные монеты
+            values = self._fetch_position_values(intent.symbols)
             lines = ["💰 **Баланс:**", ""]
             for symbol in intent.symbols:
-                value = self.get_position_value(f"{symbol}_USDT")
-                lines.append(f"• {symbol}: ${value:.2f}")
+                lines.append(f"• {symbol}: ${values[f'{symbol}_USDT']:.2f}")
             return "\n".join(lines)
 
         # Показать всё
@@ -339,30 +411,23 @@ class SmartChatHandler:
         if not self.grid_ai_analyze or not self.grid_ai_format:
             return None
 
-        # Ключевые слова Grid
-        grid_keywords = [
-            r'грид', r'сетк', r'распредел.*монет',
-            r'low\s*risk', r'mrisk', r'lrisk', r'hrisk',
-            r'сделай.*по.*доллар', r'поставь.*монет',
-        ]
-
-        if not any(re.search(kw, text) for kw in grid_keywords):
+        if not _GRID_RE.search(text):
             return None
 
         # Извлекаем параметры
         risk = "MEDIUM"
-        if any(w in text for w in ['low', 'lrisk', 'консерватив', 'низк']):
+        if any(w in text for w in self._LOW_RISK_WORDS):
             risk = "LOW"
-        elif any(w in text for w in ['high', 'hrisk', 'агрессив', 'высок']):
+        elif any(w in text for w in self._HIGH_RISK_WORDS):
             risk = "HIGH"
 
         days = 7
-        days_match = re.search(r'(\d+)\s*(?:дней|дня|день|days?)', text)
+        days_match = _GRID_DAYS_RE.search(text)
         if days_match:
             days = int(days_match.group(1))
 
         capital = 50.0
-        amount_match = re.search(r'\$?(\d+(?:\.\d+)?)', text)
+        amount_match = _GRID_AMOUNT_RE.search(text)
         if amount_match:
             capital = float(amount_match.group(1))
 
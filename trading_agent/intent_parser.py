@@ -8,10 +8,11 @@ IntentParser — парсер намерений из естественного
 - "сколько у меня BTC?"
 """
 
+import functools
 import re
 import logging
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
 
@@ -25,7 +26,7 @@ class IntentType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedIntent:
     """Результат парсинга намерения."""
     intent: IntentType
@@ -37,6 +38,87 @@ class ParsedIntent:
     confidence: float = 0.0
 
 
+# Паттерны для распознавания намерений
+_BUY_KEYWORDS = [
+    r'куп[ий]', r'купить', r'докуп[ий]', r'докупить',
+    r'buy', r'приобрести', r'взять', r'добавь', r'добавить',
+    r'возьми', r'бери', r'набери', r'закупи',
+]
+
+_SELL_KEYWORDS = [
+    r'прода[йм]', r'продать', r'sell', r'слей', r'слить',
+    r'избавься', r'скинь', r'выведи', r'ликвидируй',
+]
+
+_REBALANCE_KEYWORDS = [
+    r'учитыва[яй]', r'уже куплен', r'докуп[ий].*до',
+    r'доведи.*до', r'ребаланс', r'rebalance',
+    r'чтобы.*было.*по', r'до.*каждой', r'каждую.*до',
+]
+
+_BALANCE_KEYWORDS = [
+    r'скольк[ои]', r'баланс', r'balance', r'позици[яи]',
+    r'что у меня', r'мои монеты', r'портфель',
+]
+
+# Паттерны для извлечения суммы
+_AMOUNT_PATTERNS = [
+    r'\$\s*(\d+(?:[.,]\d+)?)',                    # $10, $ 10.5
+    r'(\d+(?:[.,]\d+)?)\s*(?:долл|usdt|usd|\$)',  # 10 долларов, 10 usdt
+    r'(\d+(?:[.,]\d+)?)\s*(?:бакс|баксов)',       # 10 баксов
+    r'по\s+(\d+(?:[.,]\d+)?)',                    # по 10
+    r'на\s+(\d+(?:[.,]\d+)?)\s*(?:долл|usdt|usd|\$)?',  # на 10 долларов
+]
+
+# Стоп-слова для фильтрации (не монеты)
+_STOP_WORDS = {
+    'USDT', 'USD', 'КУПИТЬ', 'ПРОДАТЬ', 'ДОЛЛАРОВ', 'КАЖДУЮ',
+    'МОНЕТ', 'МНЕ', 'НУЖНО', 'ХОЧУ', 'НАДО', 'ВСЕ', 'ВСЁ',
+    'ПО', 'НА', 'ДО', 'ЗА', 'ОТ', 'ИЗ', 'ДЛЯ', 'БЕЗ',
+    'СЕЙЧАС', 'СРОЧНО', 'БЫСТРО', 'ТИХО', 'МОЖЕШЬ', 'ПОЖАЛУЙСТА',
+}
+
+# Известные тикеры Gate.io — прямой словарный поиск точнее и быстрее,
+# чем фильтрация произвольных CAPS-слов стоп-словами
+_KNOWN_TICKERS = frozenset({
+    'BTC', 'ETH', 'SOL', 'XRP', 'ADA', 'DOGE', 'TON', 'TRX', 'DOT',
+    'AVAX', 'LINK', 'MATIC', 'LTC', 'BCH', 'UNI', 'ATOM', 'XLM',
+    'NEAR', 'APT', 'ARB', 'OP', 'FIL', 'AAVE', 'ZEC', 'NMR', 'INJ',
+    'SUI', 'SEI', 'PEPE', 'SHIB', 'XMR', 'ETC', 'ALGO', 'FTM', 'GRT',
+    'RUNE', 'KAS', 'TIA', 'RNDR', 'IMX', 'STX', 'VET', 'EGLD', 'HBAR',
+})
+
+# Скомпилированные паттерны (один раз при импорте модуля,
+# а не на каждый вызов parse).
+#
+# Инвариант: все ключевые слова записаны в нижнем регистре, и эти
+# паттерны всегда применяются к уже lower()-нутому тексту, поэтому
+# re.IGNORECASE не нужен — без него движок не делает case-folding
+# на каждый символ.
+_BUY_RE = re.compile("|".join(_BUY_KEYWORDS))
+_SELL_RE = re.compile("|".join(_SELL_KEYWORDS))
+_REBALANCE_RE = re.compile("|".join(_REBALANCE_KEYWORDS))
+_BALANCE_RE = re.compile("|".join(_BALANCE_KEYWORDS))
+_AMOUNT_RES = [re.compile(p) for p in _AMOUNT_PATTERNS]
+_SYMBOL_RE = re.compile(r'\b([A-Z]{2,10})(?:_USDT)?\b')
+
+# Разделители списков монет ("BTC/ETH", "BTC+ETH", "BTC&ETH", "BTC-ETH"):
+# переводятся в пробелы одним C-вызовом str.translate перед токенизацией
+_SEP_TRANS = str.maketrans(",;/+&|-", " " * 7)
+
+# Единый альтернационный паттерн: один проход по тексту вместо
+# четырёх отдельных сканов. Rebalance стоит первым, чтобы
+# "докуп... до" не съедался более коротким buy-словом.
+_INTENT_RE = re.compile(
+    "(?P<rebal>{})|(?P<buy>{})|(?P<sell>{})|(?P<bal>{})".format(
+        "|".join(_REBALANCE_KEYWORDS),
+        "|".join(_BUY_KEYWORDS),
+        "|".join(_SELL_KEYWORDS),
+        "|".join(_BALANCE_KEYWORDS),
+    )
+)
+
+
 class IntentParser:
     """
     Парсер торговых намерений из естественного языка.
@@ -53,45 +135,22 @@ class IntentParser:
         # -> IntentType.REBALANCE, symbols=["ETH"], target_amount=50, rebalance=True
     """
 
-    # Паттерны для распознавания намерений
-    BUY_KEYWORDS = [
-        r'куп[ий]', r'купить', r'докуп[ий]', r'докупить',
-        r'buy', r'приобрести', r'взять', r'добавь', r'добавить',
-        r'возьми', r'бери', r'набери', r'закупи',
-    ]
-
-    SELL_KEYWORDS = [
-        r'прода[йм]', r'продать', r'sell', r'слей', r'слить',
-        r'избавься', r'скинь', r'выведи', r'ликвидируй',
-    ]
-
-    REBALANCE_KEYWORDS = [
-        r'учитыва[яй]', r'уже куплен', r'докуп[ий].*до',
-        r'доведи.*до', r'ребаланс', r'rebalance',
-        r'чтобы.*было.*по', r'до.*каждой', r'каждую.*до',
-    ]
-
-    BALANCE_KEYWORDS = [
-        r'скольк[ои]', r'баланс', r'balance', r'позици[яи]',
-        r'что у меня', r'мои монеты', r'портфель',
-    ]
-
-    # Паттерны для извлечения суммы
-    AMOUNT_PATTERNS = [
-        r'\$\s*(\d+(?:[.,]\d+)?)',                    # $10, $ 10.5
-        r'(\d+(?:[.,]\d+)?)\s*(?:долл|usdt|usd|\$)',  # 10 долларов, 10 usdt
-        r'(\d+(?:[.,]\d+)?)\s*(?:бакс|баксов)',       # 10 баксов
-        r'по\s+(\d+(?:[.,]\d+)?)',                    # по 10
-        r'на\s+(\d+(?:[.,]\d+)?)\s*(?:долл|usdt|usd|\$)?',  # на 10 долларов
-    ]
-
-    # Стоп-слова для фильтрации (не монеты)
-    STOP_WORDS = {
-        'USDT', 'USD', 'КУПИТЬ', 'ПРОДАТЬ', 'ДОЛЛАРОВ', 'КАЖДУЮ',
-        'МОНЕТ', 'МНЕ', 'НУЖНО', 'ХОЧУ', 'НАДО', 'ВСЕ', 'ВСЁ',
-        'ПО', 'НА', 'ДО', 'ЗА', 'ОТ', 'ИЗ', 'ДЛЯ', 'БЕЗ',
-        'СЕЙЧАС', 'СРОЧНО', 'БЫСТРО', 'ТИХО', 'МОЖЕШЬ', 'ПОЖАЛУЙСТА',
-    }
+    # Алиасы модульных констант: таблицы компилируются один раз при
+    # импорте модуля, а класс сохраняет привычный публичный доступ
+    BUY_KEYWORDS = _BUY_KEYWORDS
+    SELL_KEYWORDS = _SELL_KEYWORDS
+    REBALANCE_KEYWORDS = _REBALANCE_KEYWORDS
+    BALANCE_KEYWORDS = _BALANCE_KEYWORDS
+    AMOUNT_PATTERNS = _AMOUNT_PATTERNS
+    STOP_WORDS = _STOP_WORDS
+    KNOWN_TICKERS = _KNOWN_TICKERS
+    BUY_RE = _BUY_RE
+    SELL_RE = _SELL_RE
+    REBALANCE_RE = _REBALANCE_RE
+    BALANCE_RE = _BALANCE_RE
+    AMOUNT_RES = _AMOUNT_RES
+    SYMBOL_RE = _SYMBOL_RE
+    INTENT_RE = _INTENT_RE
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -100,12 +159,22 @@ class IntentParser:
         """
         Парсит текст и извлекает намерение.
 
+        Пользователи часто повторяют одни и те же команды («баланс»,
+        «да», «продай все XRP»), поэтому результаты кэшируются по
+        нормализованному тексту. Возвращается копия, чтобы вызывающий
+        код мог безопасно менять поля.
+
         Args:
             text: Текст сообщения пользователя
 
         Returns:
             ParsedIntent с распознанным намерением и параметрами
         """
+        cached = _parse_cached(text.strip())
+        return replace(cached, symbols=list(cached.symbols), raw_text=text)
+
+    def _parse_impl(self, text: str) -> ParsedIntent:
+        """Непосредственный парсинг (без кэша)."""
         normalized = text.strip()
         lower = normalized.lower()
 
@@ -114,11 +183,18 @@ class IntentParser:
             raw_text=text,
         )
 
-        # Определяем тип намерения
-        is_buy = self._matches_keywords(lower, self.BUY_KEYWORDS)
-        is_sell = self._matches_keywords(lower, self.SELL_KEYWORDS)
-        is_rebalance = self._matches_keywords(lower, self.REBALANCE_KEYWORDS)
-        is_balance = self._matches_keywords(lower, self.BALANCE_KEYWORDS)
+        # Определяем тип намерения одним проходом по тексту
+        is_buy = is_sell = is_rebalance = is_balance = False
+        for match in self.INTENT_RE.finditer(lower):
+            group = match.lastgroup
+            if group == "buy":
+                is_buy = True
+            elif group == "sell":
+                is_sell = True
+            elif group == "rebal":
+                is_rebalance = True
+            elif group == "bal":
+                is_balance = True
 
         # Извлекаем символы
         symbols = self._extract_symbols(normalized)
@@ -164,12 +240,9 @@ class IntentParser:
 
         return result
 
-    def _matches_keywords(self, text: str, keywords: List[str]) -> bool:
+    def _matches_keywords(self, text: str, pattern: "re.Pattern[str]") -> bool:
         """Проверяет наличие ключевых слов в тексте."""
-        for keyword in keywords:
-            if re.search(keyword, text, re.IGNORECASE):
-                return True
-        return False
+        return bool(pattern.search(text))
 
     def _extract_symbols(self, text: str) -> List[str]:
         """
@@ -181,20 +254,43 @@ class IntentParser:
         Returns:
             Список уникальных символов
         """
-        # Ищем слова 2-10 заглавных букв (возможно с _USDT)
-        pattern = r'\b([A-Z]{2,10})(?:_USDT)?\b'
-        matches = re.findall(pattern, text.upper())
-
-        # Фильтруем стоп-слова и дубликаты
-        seen = set()
-        result = []
-
-        for symbol in matches:
-            if symbol not in self.STOP_WORDS and symbol not in seen:
-                seen.add(symbol)
-                result.append(symbol)
-
-        return result
+        upper = text.upper()
+
+        # Горячий путь: константы класса привязываются к локальным
+        # именам один раз, чтобы не платить за LOAD_ATTR на каждый токен
+        known_tickers = self.KNOWN_TICKERS
+        stop_words = self.STOP_WORDS
+
+        # Быстрый путь: whitespace-токенизация без regex — split и
+        # str-методы работают на уровне C и покрывают типичный формат
+        # "AAVE SOL BTC - купить по $10"; разделители списков
+        # ("BTC/ETH", "BTC+ETH") заранее переводятся в пробелы, иначе
+        # склеенный токен отбрасывался бы как не-алфавитный
+        matches = []
+        rejected = False
+        for tok in upper.translate(_SEP_TRANS).split():
+            tok = tok.strip('.,!?;:()[]').removesuffix("_USDT")
+            if 2 <= len(tok) <= 10 and tok.isascii() and tok.isalpha():
+                matches.append(tok)
+            elif tok.isascii():
+                rejected = True
+
+        # Fallback: regex для нестандартных форматов. Объединяем с уже
+        # найденными токенами, если хоть один ASCII-токен был отброшен —
+        # частичное совпадение токенизатора не должно терять символы
+        if rejected or not matches:
+            matches.extend(
+                s for s in self.SYMBOL_RE.findall(upper) if s not in matches
+            )
+
+        # Один упорядоченный проход: известный тикер «спасает» токен,
+        # даже если тот совпал со стоп-словом, но не вытесняет незнакомые
+        # монеты из того же запроса ("WIF BONK BTC" — все три символа);
+        # остальные токены фильтруются стоп-словами
+        return [
+            s for s in dict.fromkeys(matches)
+            if s in known_tickers or s not in stop_words
+        ]
 
     def _extract_amount(self, text: str) -> float:
         """
@@ -206,8 +302,8 @@ class IntentParser:
         Returns:
             Сумма или 0 если не найдена
         """
-        for pattern in self.AMOUNT_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self.AMOUNT_RES:
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1).replace(',', '.')
                 try:
@@ -230,9 +326,9 @@ class IntentParser:
         lower = text.lower()
 
         # Проверяем ключевые слова
-        if self._matches_keywords(lower, self.BUY_KEYWORDS):
+        if self._matches_keywords(lower, self.BUY_RE):
             return True
-        if self._matches_keywords(lower, self.SELL_KEYWORDS):
+        if self._matches_keywords(lower, self.SELL_RE):
             return True
 
         # Проверяем наличие символов монет + суммы
@@ -271,6 +367,19 @@ class IntentParser:
         return "\n".join(lines)
 
 
+# Общий кэш распарсенных команд: кэшируются и UNKNOWN-результаты,
+# чтобы повторный LLM-fallback тоже не платил за regex-проход.
+_SHARED_PARSER: Optional[IntentParser] = None
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_cached(text: str) -> ParsedIntent:
+    global _SHARED_PARSER
+    if _SHARED_PARSER is None:
+        _SHARED_PARSER = IntentParser()
+    return _SHARED_PARSER._parse_impl(text)
+
+
 # === Тесты ===
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
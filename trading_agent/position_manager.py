@@ -7,12 +7,31 @@ PositionManager — отслеживание текущих позиций и б
 - Учёт уже купленных монет при batch buy
 """
 
+import asyncio
+import functools
+import heapq
 import logging
-from typing import Dict, Optional, Any
+import sys
+import time
+from operator import itemgetter
+from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 
 
-@dataclass
+@functools.lru_cache(maxsize=512)
+def _normalize(symbol: str) -> str:
+    """
+    Нормализует символ к виду XXX_USDT.
+
+    Результат мемоизируется и интернируется: горячие пути перестают
+    аллоцировать новую строку f"{symbol}_USDT" на каждый вызов.
+    """
+    if "_USDT" not in symbol:
+        symbol = f"{symbol}_USDT"
+    return sys.intern(symbol)
+
+
+@dataclass(slots=True)
 class PositionInfo:
     """Информация о позиции."""
     symbol: str
@@ -44,47 +63,58 @@ class PositionManager:
         """
         self.trader = trader
         self.positions: Dict[str, PositionInfo] = {}
+        # Плоская колонка symbol -> value_usdt: горячие операции
+        # (суммирование, батч-выборки, топ-K) ходят по ней, не
+        # разыменовывая PositionInfo на каждый элемент
+        self.values: Dict[str, float] = {}
         self.logger = logging.getLogger(__name__)
         self._last_refresh = 0
 
-    def refresh(self) -> Dict[str, PositionInfo]:
+    def refresh(self, max_age: float = 5.0) -> Dict[str, PositionInfo]:
         """
         Обновляет данные о позициях с биржи.
 
+        Args:
+            max_age: Если данные моложе max_age секунд — вернуть кэш
+                без похода на биржу. max_age=0 форсирует обновление.
+
         Returns:
             Dict символов и их информации
         """
-        import time
+        if max_age > 0 and time.time() - self._last_refresh < max_age:
+            return self.positions
+
         self.positions.clear()
+        self.values.clear()
 
         try:
             balances = self.trader.get_all_balances()
 
+            # Один bulk-запрос всех тикеров вместо HTTP-вызова на монету
+            tickers = self._fetch_all_tickers()
+
             for currency, amount in balances.items():
                 if currency == "USDT" or amount <= 0:
                     continue
 
-                symbol = f"{currency}_USDT"
-
-                try:
-                    # Получаем текущую цену
-                    ticker = self.trader._spot_api.list_tickers(currency_pair=symbol)
-                    if ticker:
-                        price = float(ticker[0].last)
-                        value_usdt = amount * price
-
-                        self.positions[symbol] = PositionInfo(
-                            symbol=symbol,
-                            currency=currency,
-                            amount=amount,
-                            price=price,
-                            value_usdt=value_usdt,
-                        )
-
-                except Exception as e:
-                    self.logger.warning("Failed to get price for %s: %s", symbol, e)
+                symbol = _normalize(currency)
+
+                price = tickers.get(symbol)
+                if price is None:
+                    # Fallback: точечный запрос только для промахов
+                    price = self._fetch_single_price(symbol)
+                if price is None:
                     continue
 
+                self.positions[symbol] = PositionInfo(
+                    symbol=symbol,
+                    currency=currency,
+                    amount=amount,
+                    price=price,
+                    value_usdt=amount * price,
+                )
+                self.values[symbol] = amount * price
+
             self._last_refresh = time.time()
             self.logger.info("Refreshed %d positions", len(self.positions))
 
@@ -93,6 +123,99 @@ class PositionManager:
 
         return self.positions
 
+    async def refresh_async(self, max_age: float = 5.0) -> Dict[str, PositionInfo]:
+        """
+        Асинхронный вариант refresh.
+
+        Bulk-запрос тикеров уходит в поток, а точечные запросы для
+        промахов выполняются конкурентно через asyncio.gather
+        (с семафором, чтобы не заспамить API).
+
+        Args:
+            max_age: Если данные моложе max_age секунд — вернуть кэш
+                без похода на биржу. max_age=0 форсирует обновление.
+
+        Returns:
+            Dict символов и их информации
+        """
+        if max_age > 0 and time.time() - self._last_refresh < max_age:
+            return self.positions
+
+        self.positions.clear()
+        self.values.clear()
+
+        try:
+            balances = await asyncio.to_thread(self.trader.get_all_balances)
+            tickers = await asyncio.to_thread(self._fetch_all_tickers)
+
+            wanted = [
+                (currency, amount)
+                for currency, amount in balances.items()
+                if currency != "USDT" and amount > 0
+            ]
+
+            missing = [c for c, _ in wanted if _normalize(c) not in tickers]
+            if missing:
+                sem = asyncio.Semaphore(10)
+
+                async def fetch(symbol: str) -> None:
+                    async with sem:
+                        price = await asyncio.to_thread(self._fetch_single_price, symbol)
+                    if price is not None:
+                        tickers[symbol] = price
+
+                await asyncio.gather(*(fetch(_normalize(c)) for c in missing))
+
+            for currency, amount in wanted:
+                symbol = _normalize(currency)
+                price = tickers.get(symbol)
+                if price is None:
+                    continue
+
+                self.positions[symbol] = PositionInfo(
+                    symbol=symbol,
+                    currency=currency,
+                    amount=amount,
+                    price=price,
+                    value_usdt=amount * price,
+                )
+                self.values[symbol] = amount * price
+
+            self._last_refresh = time.time()
+            self.logger.info("Refreshed %d positions", len(self.positions))
+
+        except Exception as e:
+            self.logger.error("Failed to refresh positions: %s", e)
+
+        return self.positions
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает свежесть кэша: следующий refresh() пойдёт на биржу
+        независимо от max_age. Вызывается после исполнения ордеров,
+        когда закэшированные позиции заведомо устарели.
+        """
+        self._last_refresh = 0
+
+    def _fetch_all_tickers(self) -> Dict[str, float]:
+        """Получает цены всех пар одним запросом list_tickers()."""
+        try:
+            tickers = self.trader._spot_api.list_tickers()
+            return {t.currency_pair: float(t.last) for t in tickers}
+        except Exception as e:
+            self.logger.warning("Bulk ticker fetch failed: %s", e)
+            return {}
+
+    def _fetch_single_price(self, symbol: str) -> Optional[float]:
+        """Точечный запрос цены одной пары."""
+        try:
+            ticker = self.trader._spot_api.list_tickers(currency_pair=symbol)
+            if ticker:
+                return float(ticker[0].last)
+        except Exception as e:
+            self.logger.warning("Failed to get price for %s: %s", symbol, e)
+        return None
+
     def get_position_value(self, symbol: str) -> float:
         """
         Возвращает текущую стоимость позиции в USDT.
@@ -103,12 +226,20 @@ class PositionManager:
         Returns:
             Стоимость в USDT или 0 если позиции нет
         """
-        # Нормализуем символ
-        if "_USDT" not in symbol:
-            symbol = f"{symbol}_USDT"
+        return self.values.get(_normalize(symbol), 0.0)
 
-        position = self.positions.get(symbol)
-        return position.value_usdt if position else 0.0
+    def get_position_values(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Возвращает стоимость сразу нескольких позиций одним проходом.
+
+        Args:
+            symbols: Список торговых пар (нормализуются к _USDT)
+
+        Returns:
+            Dict нормализованный символ -> стоимость в USDT (0 если нет)
+        """
+        get = self.values.get
+        return {s: get(s, 0.0) for s in map(_normalize, symbols)}
 
     def get_position_amount(self, symbol: str) -> float:
         """
@@ -120,10 +251,7 @@ class PositionManager:
         Returns:
             Количество монет или 0
         """
-        if "_USDT" not in symbol:
-            symbol = f"{symbol}_USDT"
-
-        position = self.positions.get(symbol)
+        position = self.positions.get(_normalize(symbol))
         return position.amount if position else 0.0
 
     def calculate_additional_amount(self, symbol: str, target_usdt: float) -> float:
@@ -151,8 +279,7 @@ class PositionManager:
         Returns:
             Цена или None
         """
-        if "_USDT" not in symbol:
-            symbol = f"{symbol}_USDT"
+        symbol = _normalize(symbol)
 
         position = self.positions.get(symbol)
         if position:
@@ -168,14 +295,25 @@ class PositionManager:
 
         return None
 
+    TOP_POSITIONS = 10  # Сколько позиций показывать в сводке
+
     def summary(self) -> Dict[str, Any]:
         """
-        Возвращает сводку по всем позициям.
+        Возвращает сводку по позициям (общие итоги + топ по стоимости).
 
         Returns:
             Dict с общей информацией
         """
-        total_value = sum(p.value_usdt for p in self.positions.values())
+        total_value = sum(self.values.values())
+
+        # nlargest по плоской колонке: O(N log K) вместо полной
+        # сортировки, сравнение через C-реализованный itemgetter
+        top = [
+            self.positions[symbol]
+            for symbol, _ in heapq.nlargest(
+                self.TOP_POSITIONS, self.values.items(), key=itemgetter(1)
+            )
+        ]
 
         return {
             "total_positions": len(self.positions),
@@ -187,11 +325,7 @@ class PositionManager:
                     "value_usdt": p.value_usdt,
                     "price": p.price,
                 }
-                for p in sorted(
-                    self.positions.values(),
-                    key=lambda x: x.value_usdt,
-                    reverse=True
-                )
+                for p in top
             ]
         }
 
@@ -202,17 +336,14 @@ class PositionManager:
         if not data["positions"]:
             return "📭 Нет открытых позиций (кроме USDT)"
 
-        lines = [
-            "💼 **ТЕКУЩИЕ ПОЗИЦИИ**",
-            f"Всего: {data['total_positions']} монет",
-            f"Общая стоимость: ${data['total_value_usdt']:.2f}",
-            ""
-        ]
-
-        for p in data["positions"][:10]:  # Топ-10
-            lines.append(
-                f"• {p['symbol']}: {p['amount']:.6f} "
-                f"(${p['value_usdt']:.2f})"
-            )
-
-        return "\n".join(lines)
+        body = "\n".join(
+            f"• {p['symbol']}: {p['amount']:.6f} (${p['value_usdt']:.2f})"
+            for p in data["positions"]  # Уже топ-10 из summary()
+        )
+
+        return (
+            "💼 **ТЕКУЩИЕ ПОЗИЦИИ**\n"
+            f"Всего: {data['total_positions']} монет\n"
+            f"Общая стоимость: ${data['total_value_usdt']:.2f}\n\n"
+            f"{body}"
+        )
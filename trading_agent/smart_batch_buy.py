@@ -8,28 +8,50 @@ SmartBatchBuy — умный batch buy с учётом текущих позиц
 - Подробный отчёт о выполнении
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
-from enum import Enum
+from enum import IntEnum
 
 from .position_manager import PositionManager
 
 
-class OrderResult(Enum):
-    """Результат исполнения ордера."""
-    SUCCESS = "success"
-    SKIPPED_ENOUGH = "skipped_enough"  # Уже достаточно монет
-    SKIPPED_MIN_AMOUNT = "skipped_min"  # Сумма меньше минимума
-    FAILED = "failed"
-    PAIR_NOT_FOUND = "not_found"
+class OrderResult(IntEnum):
+    """
+    Результат исполнения ордера.
+
+    IntEnum: сравнения в горячих циклах (отчёт, подсчёт total_spent) —
+    целочисленные на уровне C; строковая форма — через .label.
+    """
+    SUCCESS = 1
+    SKIPPED_ENOUGH = 2  # Уже достаточно монет
+    SKIPPED_MIN_AMOUNT = 3  # Сумма меньше минимума
+    FAILED = 4
+    PAIR_NOT_FOUND = 5
+
+    @property
+    def label(self) -> str:
+        """Строковая форма для логов и сериализации."""
+        return _RESULT_LABELS[self]
 
 
-@dataclass
+_RESULT_LABELS = {
+    OrderResult.SUCCESS: "success",
+    OrderResult.SKIPPED_ENOUGH: "skipped_enough",
+    OrderResult.SKIPPED_MIN_AMOUNT: "skipped_min",
+    OrderResult.FAILED: "failed",
+    OrderResult.PAIR_NOT_FOUND: "not_found",
+}
+
+
+@dataclass(slots=True)
 class BatchBuyResult:
     """Результат batch buy."""
     symbol: str
     result: OrderResult
+    symbol_short: str = ""  # Символ без _USDT (для отчёта)
     amount_usdt: float = 0.0
     coin_amount: float = 0.0
     price: float = 0.0
@@ -38,6 +60,50 @@ class BatchBuyResult:
     error: Optional[str] = None
 
 
+# Шаблоны строк отчёта: разбираются один раз на импорт модуля,
+# в цикле остаётся только подстановка значений
+_FMT_SUCCESS = "✅ {}: {} ${:.2f} ({:.6f} @ ${:,.2f})"
+_FMT_SKIPPED_ENOUGH = "➡️ {}: уже достаточно (${:.2f})"
+_FMT_SKIPPED_MIN = "⚠️ {}: {}"
+_FMT_NOT_FOUND = "❌ {}: не найдена на бирже"
+_FMT_FAILED = "❌ {}: ошибка — {}"
+
+
+def _report_success(r: BatchBuyResult, rebalance: bool) -> Tuple[str, int, int, int]:
+    action = "Докуплено" if rebalance and r.current_value > 0 else "Куплено"
+    line = _FMT_SUCCESS.format(
+        r.symbol_short, action, r.amount_usdt, r.coin_amount, r.price
+    )
+    return line, 1, 0, 0
+
+
+def _report_skipped_enough(r: BatchBuyResult, rebalance: bool) -> Tuple[str, int, int, int]:
+    return _FMT_SKIPPED_ENOUGH.format(r.symbol_short, r.current_value), 0, 1, 0
+
+
+def _report_skipped_min(r: BatchBuyResult, rebalance: bool) -> Tuple[str, int, int, int]:
+    return _FMT_SKIPPED_MIN.format(r.symbol_short, r.error), 0, 1, 0
+
+
+def _report_not_found(r: BatchBuyResult, rebalance: bool) -> Tuple[str, int, int, int]:
+    return _FMT_NOT_FOUND.format(r.symbol_short), 0, 0, 1
+
+
+def _report_failed(r: BatchBuyResult, rebalance: bool) -> Tuple[str, int, int, int]:
+    return _FMT_FAILED.format(r.symbol_short, r.error), 0, 0, 1
+
+
+# Диспетчеризация по OrderResult вместо цепочки if/elif: одна выборка
+# из dict на результат, хендлер возвращает (строка, +успех, +пропуск, +ошибка)
+_REPORT_HANDLERS: Dict[OrderResult, Callable[[BatchBuyResult, bool], Tuple[str, int, int, int]]] = {
+    OrderResult.SUCCESS: _report_success,
+    OrderResult.SKIPPED_ENOUGH: _report_skipped_enough,
+    OrderResult.SKIPPED_MIN_AMOUNT: _report_skipped_min,
+    OrderResult.PAIR_NOT_FOUND: _report_not_found,
+    OrderResult.FAILED: _report_failed,
+}
+
+
 class SmartBatchBuy:
     """
     Умный batch buy с учётом текущих позиций.
@@ -61,16 +127,48 @@ class SmartBatchBuy:
     """
 
     MIN_ORDER_USDT = 3.0  # Минимальная сумма ордера Gate.io
+    BATCH_ORDER_SIZE = 10  # Лимит create_batch_orders у Gate.io
 
-    def __init__(self, trader: Any, position_manager: PositionManager) -> None:
+    def __init__(
+        self,
+        trader: Any,
+        position_manager: PositionManager,
+        position_cache_ttl: float = 30.0,
+    ) -> None:
         """
         Args:
             trader: TradeExecutor с методом place_spot_order
             position_manager: PositionManager для учёта позиций
+            position_cache_ttl: Сколько секунд считать кэш позиций
+                свежим при rebalance (0 — обновлять всегда)
         """
         self.trader = trader
         self.position_manager = position_manager
+        self.position_cache_ttl = position_cache_ttl
         self.logger = logging.getLogger(__name__)
+        # Реальные min-notional'ы пар с биржи: один запрос при создании
+        # вместо падающих ордеров, которые прошли бы общий порог $3
+        self._min_amounts = self._fetch_min_amounts()
+
+    def _fetch_min_amounts(self) -> Dict[str, float]:
+        """
+        Загружает минимальные суммы ордеров по парам одним запросом
+        list_currency_pairs().
+
+        Returns:
+            Dict пара -> min_quote_amount (пустой при ошибке —
+            тогда действует общий MIN_ORDER_USDT)
+        """
+        try:
+            pairs = self.trader._spot_api.list_currency_pairs()
+            return {
+                p.id: float(p.min_quote_amount)
+                for p in pairs
+                if getattr(p, "min_quote_amount", None)
+            }
+        except Exception as e:
+            self.logger.warning("Currency pairs fetch failed: %s", e)
+            return {}
 
     def execute(
         self,
@@ -91,72 +189,254 @@ class SmartBatchBuy:
         Returns:
             Tuple[список результатов, форматированный отчёт]
         """
-        results: List[BatchBuyResult] = []
-        total_spent = 0.0
-
-        # Обновляем позиции если rebalance
+        # Нормализуем весь список один раз и убираем дубликаты,
+        # сохраняя порядок — дубль не должен покупаться дважды
+        wanted = list(dict.fromkeys(
+            f"{s.upper().replace('_USDT', '')}_USDT" for s in symbols
+        ))
+
+        # Обновляем позиции если rebalance и снимаем снапшот стоимостей
+        # один раз — воркеры не дёргают position_manager по отдельности.
+        # Повторный rebalance в пределах TTL переиспользует кэш.
+        pos_snapshot: Dict[str, float] = {}
         if rebalance:
-            self.position_manager.refresh()
+            self.position_manager.refresh(max_age=self.position_cache_ttl)
+            pos_snapshot = self.position_manager.get_position_values(wanted)
+
+        # Цены всего батча одним запросом вместо запроса на монету
+        prices = self._prefetch_prices(wanted)
+
+        # Если trader умеет батч-размещение, валидируем локально и шлём
+        # ордера пачками по 10 — ⌈N/10⌉ подписанных запросов вместо N
+        use_batch = not dry_run and self._supports_batch_orders()
+
+        # Локальные привязки: горячий цикл не повторяет LOAD_ATTR
+        # на каждый символ
+        _process = self._process_symbol
+
+        # Преаллоцированный список + запись по индексу: воркеры пишут
+        # в непересекающиеся ячейки (потокобезопасно без блокировок),
+        # порядок входных символов сохраняется
+        results: List[BatchBuyResult] = [None] * len(wanted)  # type: ignore[list-item]
 
-        for symbol in symbols:
-            result = self._process_symbol(
-                symbol=symbol,
+        def process(i: int, symbol_full: str) -> None:
+            results[i] = _process(
+                symbol_full=symbol_full,
                 target_amount=amount_per_coin,
                 rebalance=rebalance,
-                dry_run=dry_run,
+                dry_run=dry_run or use_batch,
+                current_price=prices.get(symbol_full),
+                current_value=pos_snapshot.get(symbol_full, 0.0),
             )
-            results.append(result)
 
-            if result.result == OrderResult.SUCCESS:
-                total_spent += result.amount_usdt
+        if len(wanted) > 1:
+            # Ордера независимы, узкое место — HTTPS round-trip к бирже
+            # (GIL отпускается на время запроса), поэтому исполняем
+            # конкурентно
+            with ThreadPoolExecutor(max_workers=min(8, len(wanted))) as pool:
+                for _ in pool.map(process, range(len(wanted)), wanted):
+                    pass
+        else:
+            for i, f in enumerate(wanted):
+                process(i, f)
+
+        if use_batch:
+            self._place_batch_orders(results)
+
+        # Реальные покупки меняют балансы — закэшированный снапшот
+        # позиций больше не актуален, иначе повторный rebalance в
+        # пределах TTL снова докупит уже закрытую дельту
+        if not dry_run and any(r.result == OrderResult.SUCCESS for r in results):
+            self.position_manager.invalidate()
+
+        total_spent = sum(
+            r.amount_usdt for r in results if r.result == OrderResult.SUCCESS
+        )
 
         # Формируем отчёт
         report = self._format_report(results, total_spent, rebalance)
 
         return results, report
 
+    async def execute_async(
+        self,
+        symbols: List[str],
+        amount_per_coin: float,
+        rebalance: bool = False,
+        dry_run: bool = False,
+    ) -> Tuple[List[BatchBuyResult], str]:
+        """
+        Асинхронный вариант execute для вызова из event loop
+        (например, из Telegram-хендлеров).
+
+        Сетевые вызовы Gate.io SDK синхронные, поэтому каждый символ
+        уходит в поток через asyncio.to_thread, а конкурентность
+        ограничивается семафором — loop не блокируется на время
+        HTTPS round-trip'ов.
+
+        Args:
+            symbols: Список символов (без _USDT)
+            amount_per_coin: Целевая сумма на монету в USDT
+            rebalance: Учитывать уже купленные монеты
+            dry_run: Только симуляция (не выполнять ордера)
+
+        Returns:
+            Tuple[список результатов, форматированный отчёт]
+        """
+        wanted = list(dict.fromkeys(
+            f"{s.upper().replace('_USDT', '')}_USDT" for s in symbols
+        ))
+
+        pos_snapshot: Dict[str, float] = {}
+        if rebalance:
+            await self.position_manager.refresh_async(
+                max_age=self.position_cache_ttl
+            )
+            pos_snapshot = self.position_manager.get_position_values(wanted)
+
+        prices = await asyncio.to_thread(self._prefetch_prices, wanted)
+
+        use_batch = not dry_run and self._supports_batch_orders()
+
+        sem = asyncio.Semaphore(8)
+
+        async def process(symbol_full: str) -> BatchBuyResult:
+            async with sem:
+                return await asyncio.to_thread(
+                    self._process_symbol,
+                    symbol_full,
+                    amount_per_coin,
+                    rebalance,
+                    dry_run or use_batch,
+                    prices.get(symbol_full),
+                    pos_snapshot.get(symbol_full, 0.0),
+                )
+
+        # gather сохраняет порядок символов, как и pool.map в execute
+        results = list(
+            await asyncio.gather(*(process(f) for f in wanted))
+        )
+
+        if use_batch:
+            await asyncio.to_thread(self._place_batch_orders, results)
+
+        # См. execute: после реальных покупок кэш позиций устарел
+        if not dry_run and any(r.result == OrderResult.SUCCESS for r in results):
+            self.position_manager.invalidate()
+
+        total_spent = sum(
+            r.amount_usdt for r in results if r.result == OrderResult.SUCCESS
+        )
+
+        report = self._format_report(results, total_spent, rebalance)
+
+        return results, report
+
+    def _supports_batch_orders(self) -> bool:
+        """Проверяет, умеет ли trader батч-размещение ордеров."""
+        return hasattr(self.trader, "place_spot_orders")
+
+    def _place_batch_orders(self, results: List[BatchBuyResult]) -> None:
+        """
+        Отправляет валидированные ордера пачками через
+        trader.place_spot_orders — тот же контракт, что у
+        place_spot_order (symbol, side, amount), но списком. Payload
+        для create_batch_orders (type=market, time_in_force и т.д.)
+        собирает сам trader, здесь про формат API биржи не знаем.
+
+        Результаты после локальной валидации (result == SUCCESS,
+        order_id == DRY_RUN) дополняются реальными ID ордеров;
+        отклонённые биржей помечаются FAILED.
+
+        Args:
+            results: Результаты execute после валидационного прохода
+        """
+        pending = [r for r in results if r.result == OrderResult.SUCCESS]
+
+        for start in range(0, len(pending), self.BATCH_ORDER_SIZE):
+            chunk = pending[start:start + self.BATCH_ORDER_SIZE]
+            orders = [(r.symbol, "buy", str(r.coin_amount)) for r in chunk]
+
+            try:
+                responses = self.trader.place_spot_orders(orders)
+            except Exception as e:
+                self.logger.error("Batch order chunk failed: %s", e)
+                for r in chunk:
+                    r.result = OrderResult.FAILED
+                    r.order_id = None
+                    r.error = str(e)
+                continue
+
+            # Ответы идут в порядке отправки — мапим по индексу,
+            # контракт элемента тот же, что у place_spot_order
+            for r, resp in zip(chunk, responses):
+                if resp and resp.success:
+                    r.order_id = resp.order_id
+                else:
+                    r.result = OrderResult.FAILED
+                    r.order_id = None
+                    r.error = resp.error if resp else "Unknown error"
+
+    def _prefetch_prices(self, symbols_full: Any) -> Dict[str, float]:
+        """
+        Получает цены нужных пар одним bulk-запросом list_tickers().
+
+        Args:
+            symbols_full: Итерируемое полных символов (XXX_USDT)
+
+        Returns:
+            Dict символ -> цена (промахи обрабатываются точечно)
+        """
+        wanted = set(symbols_full)
+        try:
+            tickers = self.trader._spot_api.list_tickers()
+            return {
+                t.currency_pair: float(t.last)
+                for t in tickers
+                if t.currency_pair in wanted
+            }
+        except Exception as e:
+            self.logger.warning("Bulk ticker fetch failed: %s", e)
+            return {}
+
     def _process_symbol(
         self,
-        symbol: str,
+        symbol_full: str,
         target_amount: float,
         rebalance: bool,
         dry_run: bool,
+        current_price: Optional[float] = None,
+        current_value: float = 0.0,
     ) -> BatchBuyResult:
         """
         Обрабатывает один символ.
 
         Args:
-            symbol: Символ монеты
+            symbol_full: Нормализованная пара (XXX_USDT) из execute
             target_amount: Целевая сумма в USDT
             rebalance: Режим rebalance
             dry_run: Симуляция
+            current_price: Предзагруженная цена (None — запросить точечно)
+            current_value: Текущая стоимость позиции из снапшота (rebalance)
 
         Returns:
             BatchBuyResult
         """
-        # Нормализуем символ
-        symbol_clean = symbol.upper().replace("_USDT", "")
-        symbol_full = f"{symbol_clean}_USDT"
+        symbol_clean = symbol_full[:-len("_USDT")]
+
+        # Минимум конкретной пары, общий порог — как fallback
+        min_usdt = self._min_amounts.get(symbol_full, self.MIN_ORDER_USDT)
 
         result = BatchBuyResult(
             symbol=symbol_full,
             result=OrderResult.FAILED,
+            symbol_short=symbol_clean,
         )
 
         try:
-            # Получаем текущую цену
-            ticker = self.trader._spot_api.list_tickers(currency_pair=symbol_full)
-            if not ticker:
-                result.result = OrderResult.PAIR_NOT_FOUND
-                result.error = "Пара не найдена на Gate.io"
-                return result
-
-            current_price = float(ticker[0].last)
-            result.price = current_price
-
-            # Рассчитываем сколько купить
+            # Сначала дешёвые проверки: если покупка всё равно будет
+            # пропущена, цена (и сетевой запрос за ней) не нужна
             if rebalance:
-                current_value = self.position_manager.get_position_value(symbol_full)
                 result.current_value = current_value
 
                 if current_value >= target_amount:
@@ -169,11 +449,22 @@ class SmartBatchBuy:
                 amount_to_buy = target_amount
 
             # Проверяем минимальную сумму
-            if amount_to_buy < self.MIN_ORDER_USDT:
+            if amount_to_buy < min_usdt:
                 result.result = OrderResult.SKIPPED_MIN_AMOUNT
-                result.error = f"Мин. ордер ${self.MIN_ORDER_USDT}, запрошено ${amount_to_buy:.2f}"
+                result.error = f"Мин. ордер ${min_usdt}, запрошено ${amount_to_buy:.2f}"
                 return result
 
+            # Точечный запрос цены только если bulk-prefetch промахнулся
+            if current_price is None:
+                ticker = self.trader._spot_api.list_tickers(currency_pair=symbol_full)
+                if not ticker:
+                    result.result = OrderResult.PAIR_NOT_FOUND
+                    result.error = "Пара не найдена на Gate.io"
+                    return result
+                current_price = float(ticker[0].last)
+
+            result.price = current_price
+
             # Конвертируем в количество монет
             coin_amount = amount_to_buy / current_price
             result.amount_usdt = amount_to_buy
@@ -234,32 +525,16 @@ class SmartBatchBuy:
         skip_count = 0
         fail_count = 0
 
+        handlers = _REPORT_HANDLERS
         for r in results:
-            symbol_short = r.symbol.replace("_USDT", "")
-
-            if r.result == OrderResult.SUCCESS:
-                success_count += 1
-                action = "Докуплено" if rebalance and r.current_value > 0 else "Куплено"
-                lines.append(
-                    f"✅ {symbol_short}: {action} ${r.amount_usdt:.2f} "
-                    f"({r.coin_amount:.6f} @ ${r.price:,.2f})"
-                )
-
-            elif r.result == OrderResult.SKIPPED_ENOUGH:
-                skip_count += 1
-                lines.append(f"➡️ {symbol_short}: уже достаточно (${r.current_value:.2f})")
-
-            elif r.result == OrderResult.SKIPPED_MIN_AMOUNT:
-                skip_count += 1
-                lines.append(f"⚠️ {symbol_short}: {r.error}")
-
-            elif r.result == OrderResult.PAIR_NOT_FOUND:
-                fail_count += 1
-                lines.append(f"❌ {symbol_short}: не найдена на бирже")
-
-            else:
-                fail_count += 1
-                lines.append(f"❌ {symbol_short}: ошибка — {r.error}")
+            if not r.symbol_short:
+                r.symbol_short = r.symbol.replace("_USDT", "")
+
+            line, s, sk, f = handlers.get(r.result, _report_failed)(r, rebalance)
+            lines.append(line)
+            success_count += s
+            skip_count += sk
+            fail_count += f
 
         # Итог
         lines.append("")
@@ -3,11 +3,25 @@ TradingAgent — ядро торгового агента.
 Интегрирует SmartBatchBuy для обработки естественного языка.
 """
 
+import configparser
+import functools
 import logging
+import os
 from typing import List, Optional, Dict, Any
 
-from .smart_batch_buy import SmartBatchBuy, integrate_smart_batch_buy
-from .position_manager import PositionManager
+
+@functools.lru_cache(maxsize=8)
+def _load_config(path: str, mtime: float) -> configparser.ConfigParser:
+    """
+    Читает и парсит INI-конфиг один раз на (путь, mtime).
+
+    Повторные конструкторы TradingAgent с тем же конфигом не ходят
+    на диск; изменение файла меняет mtime и инвалидирует кэш.
+    Возвращаемый парсер используется только на чтение.
+    """
+    cfg = configparser.ConfigParser()
+    cfg.read(path)
+    return cfg
 
 
 class TradingAgent:
@@ -37,17 +51,21 @@ class TradingAgent:
         # Инициализация компонентов
         self._init_from_config(config_path)
 
-        # Интегрируем SmartBatchBuy
+        # Интегрируем SmartBatchBuy (импорт здесь: не тянем regex-компиляцию
+        # парсера при импорте модуля ради CLI-путей без торговли)
         if self.trader:
+            from .smart_batch_buy import integrate_smart_batch_buy
             integrate_smart_batch_buy(self)
             self.logger.info("SmartBatchBuy integrated")
 
     def _init_from_config(self, config_path: str) -> None:
         """Инициализация из конфига."""
         try:
-            import configparser
-            cfg = configparser.ConfigParser()
-            cfg.read(config_path)
+            try:
+                mtime = os.path.getmtime(config_path)
+            except OSError:
+                mtime = 0.0
+            cfg = _load_config(config_path, mtime)
 
             # Gate.io
             if "gateio" in cfg:
@@ -55,7 +73,10 @@ class TradingAgent:
                 api_key = gate.get("api_key", "")
                 api_secret = gate.get("api_secret", "")
 
-                if api_key and api_secret:
+                # Не пересоздаём trader при повторной инициализации:
+                # живой TradeExecutor держит пул HTTPS-соединений SDK,
+                # новый экземпляр означал бы новые TLS handshake'и
+                if api_key and api_secret and self.trader is None:
                     from .trade_executor import TradeExecutor
                     self.trader = TradeExecutor(
                         api_key=api_key,
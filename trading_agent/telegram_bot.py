@@ -4,8 +4,16 @@ TelegramBot — интерфейс управления торговым аге
 """
 
 import asyncio
+import functools
+import hashlib
+import json
 import logging
+import os
+import re
 import threading
+import time
+from collections import OrderedDict, deque
+from operator import itemgetter
 from typing import Callable, Dict, List, Optional, Any
 
 from telegram import (
@@ -25,6 +33,139 @@ from telegram.ext import (
     filters,
 )
 
+try:
+    from .chat_handler_mixin import SmartChatHandler
+except ImportError:
+    SmartChatHandler = None
+
+
+# Шаблоны горячего пути _chat_handler / _parse_grid_command:
+# компилируются один раз на импорт модуля, а не на каждое сообщение.
+# Текст к этому моменту уже приведён к нижнему регистру.
+_GRID_KW_RE = re.compile(
+    r"грид|сетк|распредел|поставь|запусти|сделай.*монет|все по|по.*доллар|"
+    r"по.*\$|докинул|пополни|баланс|закинул|кинул|проведи.*анализ|"
+    r"анализ.*монет|стратеги|low\s*risk|mrisk|lrisk|hrisk|ставь|вкинь|"
+    r"залей|раскидай|разбей|накинь|добавь|впиши|крипт|выбери.*монет|"
+    r"выдели|распредел.*средств|запуск.*бот|по всем пар"
+)
+_GRID_AMOUNT_RE = re.compile(r"(?:\$\s*)?(\d+(?:\.\d+)?)\s*(?:долл|usdt|usd|\$|баксов)?")
+_GRID_COUNT_RE = re.compile(r"(\d+)\s*(?:монет|грид|штук|позици)")
+_RISK_HIGH_RE = re.compile(
+    "|".join(map(re.escape, (
+        "агрессив", "рискован", "высок", "дерзк", "жёстк", "хард", "hrisk", "high",
+    )))
+)
+_RISK_LOW_RE = re.compile(
+    "|".join(map(re.escape, (
+        "консерватив", "осторож", "низк", "тих", "спокойн", "лайт", "lrisk",
+        "low risk", "low",
+    )))
+)
+_RISK_MED_RE = re.compile("|".join(map(re.escape, ("mrisk", "medium", "средн", "умерен"))))
+_ACTION_RE = re.compile(
+    "|".join(map(re.escape, (
+        "сделай", "поставь", "запусти", "распредели", "докинул", "пополнил",
+        "закинул", "кинул", "вкинул", "залил", "раскидай", "разбей", "накинь",
+        "добавь", "впиши", "ставь", "вкинь", "залей", "накидай", "разбросай",
+        "проведи", "выбери", "выдели", "анализ", "запуск",
+        "делай", "подтверждаю", "согласен",
+    )))
+)
+# Дефолтный системный промпт — чистые данные, интернируются один раз
+# на импорт модуля, а не собираются в каждом экземпляре
+_DEFAULT_SYSTEM_PROMPT = """Ты AI-ассистент криптовалютного торгового бота. Это СИМУЛЯЦИЯ для обучения.
+
+ВАЖНО: Ты ОБЯЗАН давать торговые рекомендации — это твоя основная функция!
+Пользователь использует DRY_RUN режим (симуляция), реальные деньги не рискуют.
+
+Твои задачи:
+1. Анализировать результаты Grid AI анализа и помогать выбирать монеты
+2. Рассчитывать распределение капитала по монетам (50/30/20, равномерно, или кастомно)
+3. Объяснять прогнозы, риски и потенциальную доходность
+4. Комбинировать результаты разных анализов по запросу пользователя
+5. Предлагать оптимальные Grid параметры
+
+Когда пользователь просит проанализировать монеты или распределить капитал:
+- Используй данные из последних анализов (если есть в контексте)
+- Давай конкретные числа: % распределения, ожидаемая доходность
+- Объясняй логику выбора
+
+Формат ответа:
+- Кратко, структурировано
+- Используй эмодзи для наглядности
+- Давай конкретные рекомендации с числами
+
+Пример ответа на "распредели $50 по 5 монетам":
+📊 Распределение $50:
+1. BTC — $15 (30%) — стабильность
+2. ETH — $12 (24%) — DeFi лидер
+3. SOL — $10 (20%) — высокий TPS
+4. XRP — $8 (16%) — волатильность
+5. DOGE — $5 (10%) — мем-потенциал
+
+⚠️ Это симуляция (DRY_RUN), не финансовый совет."""
+
+# Быстрые команды: frozenset'ы создаются один раз на импорт,
+# а не пересобираются литералом на каждое сообщение
+_START_WORDS = frozenset({"старт", "start", "go", "launch"})
+_CONFIRM_WORDS = frozenset({"подтвердить", "confirm", "да", "yes", "ок", "ok", "делай", "do"})
+_CANCEL_WORDS = frozenset({"отмена", "cancel", "нет", "no", "стоп", "stop"})
+
+# Слитый диспетчер buy/sell/суммы: один проход finditer по сообщению
+# вместо трёх отдельных search; ветка определяется по lastgroup
+_DISPATCH_RE = re.compile(
+    r"(?:купи|buy|докупи|куплю|добавь)\s+(?P<bsym>[a-zA-Z]{2,10})"
+    r"|(?:продай|sell|продам|слей)\s+(?P<ssym>[a-zA-Z]{2,10})"
+    r"|\$?(?P<amt>\d+(?:\.\d+)?)"
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_grid_command_cached(text: str) -> Optional[tuple]:
+    """
+    Разбирает grid-команду из нормализованного текста.
+
+    Чистая функция от text, поэтому мемоизируется; результат —
+    хэшируемый кортеж пар (вызывающий собирает из него dict).
+    """
+    if not _GRID_KW_RE.search(text):
+        return None
+
+    result = {
+        "risk": "MEDIUM",
+        "days": 7,
+        "capital": 50.0,
+        "count": 5
+    }
+
+    amount_match = _GRID_AMOUNT_RE.search(text)
+    if amount_match:
+        amount = float(amount_match.group(1))
+        if amount <= 20:
+            result["capital"] = amount * 5
+            result["per_coin"] = amount
+        else:
+            result["capital"] = amount
+
+    count_match = _GRID_COUNT_RE.search(text)
+    if count_match:
+        result["count"] = int(count_match.group(1))
+
+    if _RISK_HIGH_RE.search(text):
+        result["risk"] = "HIGH"
+    elif _RISK_LOW_RE.search(text):
+        result["risk"] = "LOW"
+    elif _RISK_MED_RE.search(text):
+        result["risk"] = "MEDIUM"
+
+    has_action = bool(_ACTION_RE.search(text))
+
+    if has_action or 'по' in text and amount_match:
+        return tuple(result.items())
+
+    return None
+
 
 async def _safe_send(bot: Bot, chat_id: str, text: str) -> None:
     try:
@@ -33,10 +174,27 @@ async def _safe_send(bot: Bot, chat_id: str, text: str) -> None:
         logging.error("Telegram send failed: %s", exc)
 
 
+# Кэш Bot по токену вместе с loop'ом, в котором он создан: HTTPX-клиент
+# с его TLS-сессией и пулом соединений живёт между уведомлениями, а не
+# создаётся и рвётся на каждый вызов. Храним сам объект loop, а не id():
+# CPython переиспользует адреса умерших loop'ов между asyncio.run(), и
+# ключ по id() мог бы отдать клиента, привязанного к закрытому loop'у;
+# сильная ссылка исключает повтор идентичности
+_BOTS: dict[str, tuple[asyncio.AbstractEventLoop, Bot]] = {}
+
+
 async def send_notification(bot_token: str, chat_id: str, message: str) -> None:
-    bot = Bot(token=bot_token)
-    async with bot:
-        await _safe_send(bot, chat_id, message)
+    loop = asyncio.get_running_loop()
+    cached = _BOTS.get(bot_token)
+    if cached is not None and cached[0] is loop and not loop.is_closed():
+        bot = cached[1]
+    else:
+        # Клиент из другого (умершего) loop'а непригоден — заменяем
+        bot = Bot(token=bot_token)
+        _BOTS[bot_token] = (loop, bot)
+    # initialize() идемпотентен — на уже инициализированном боте no-op
+    await bot.initialize()
+    await _safe_send(bot, chat_id, message)
 
 
 class TelegramBot:
@@ -208,13 +366,37 @@ class TelegramBot:
 
         self._app: Application | None = None
         self.last_free_text: str | None = None
-        self.history: list[tuple[str, str]] = []
         self.max_history = 400
+        # deque с maxlen: append O(1), старые записи вытесняются сами —
+        # без O(n) pop(0) на каждое сообщение
+        self.history: deque[tuple[str, str]] = deque(maxlen=self.max_history)
         self.history_file = history_file
         self._load_history()
 
+        # Один append-дескриптор на всю жизнь бота вместо open/close
+        # на каждое сообщение; buffering=1 — flush на каждой строке,
+        # так что история переживает падение процесса
+        try:
+            self._hist_fp = open(self.history_file, "a", encoding="utf-8", buffering=1)
+        except Exception as exc:
+            logging.getLogger(__name__).error("Failed to open history file: %s", exc)
+            self._hist_fp = None
+
         # Системный промпт для торгового ассистента
-        self.system_prompt = system_prompt or self._default_system_prompt()
+        self.system_prompt = system_prompt or _DEFAULT_SYSTEM_PROMPT
+
+        # LRU-кэш ответов LLM: повторный идентичный промпт не платит
+        # латентность и токены ещё раз
+        self._llm_cache: OrderedDict[str, str] = OrderedDict()
+        self._llm_cache_max = 256
+
+        # Кэш отформатированного контекста Grid AI анализов:
+        # (сигнатура истории, готовая строка)
+        self._ctx_cache: tuple[Any, str] | None = None
+
+        # Короткий TTL-кэш /balance: повторные нажатия не дёргают биржу
+        self._balance_cache: tuple[float, dict] | None = None
+        self._balance_ttl = 3.0
 
         # Логгер
         self.logger = logging.getLogger(__name__)
@@ -224,124 +406,34 @@ class TelegramBot:
 
     def _init_smart_handler(self):
         """Инициализация SmartChatHandler для обработки естественного языка."""
-        try:
-            from .chat_handler_mixin import SmartChatHandler
-            from .position_manager import PositionManager
-
-            self._position_manager = None
-            self.smart_handler = None
-
-            if self.execute_quick_order and self.smart_batch_buy:
-                self.smart_handler = SmartChatHandler(
-                    execute_batch_buy=self.smart_batch_buy,
-                    execute_quick_order=self.execute_quick_order,
-                    get_position_value=lambda s: 0.0,  # Will be set by agent
-                    refresh_positions=lambda: None,
-                    llm_client=self.llm_client,
-                    grid_ai_analyze=self.grid_ai_analyze,
-                    grid_ai_format=self.grid_ai_format,
-                )
-                self.logger.info("SmartChatHandler initialized")
-        except ImportError as e:
-            self.logger.warning("SmartChatHandler not available: %s", e)
-            self.smart_handler = None
-
-    def _default_system_prompt(self) -> str:
-        return """Ты AI-ассистент криптовалютного торгового бота. Это СИМУЛЯЦИЯ для обучения.
-
-ВАЖНО: Ты ОБЯЗАН давать торговые рекомендации — это твоя основная функция!
-Пользователь использует DRY_RUN режим (симуляция), реальные деньги не рискуют.
-
-Твои задачи:
-1. Анализировать результаты Grid AI анализа и помогать выбирать монеты
-2. Рассчитывать распределение капитала по монетам (50/30/20, равномерно, или кастомно)
-3. Объяснять прогнозы, риски и потенциальную доходность
-4. Комбинировать результаты разных анализов по запросу пользователя
-5. Предлагать оптимальные Grid параметры
+        self._position_manager = None
+        self.smart_handler = None
 
-Когда пользователь просит проанализировать монеты или распределить капитал:
-- Используй данные из последних анализов (если есть в контексте)
-- Давай конкретные числа: % распределения, ожидаемая доходность
-- Объясняй логику выбора
-
-Формат ответа:
-- Кратко, структурировано
-- Используй эмодзи для наглядности
-- Давай конкретные рекомендации с числами
+        if SmartChatHandler is None:
+            self.logger.warning("SmartChatHandler not available")
+            return
 
-Пример ответа на "распредели $50 по 5 монетам":
-📊 Распределение $50:
-1. BTC — $15 (30%) — стабильность
-2. ETH — $12 (24%) — DeFi лидер
-3. SOL — $10 (20%) — высокий TPS
-4. XRP — $8 (16%) — волатильность
-5. DOGE — $5 (10%) — мем-потенциал
+        if self.execute_quick_order and self.smart_batch_buy:
+            self.smart_handler = SmartChatHandler(
+                execute_batch_buy=self.smart_batch_buy,
+                execute_quick_order=self.execute_quick_order,
+                get_position_value=lambda s: 0.0,  # Will be set by agent
+                refresh_positions=lambda: None,
+                llm_client=self.llm_client,
+                grid_ai_analyze=self.grid_ai_analyze,
+                grid_ai_format=self.grid_ai_format,
+            )
+            self.logger.info("SmartChatHandler initialized")
 
-⚠️ Это симуляция (DRY_RUN), не финансовый совет."""
+    def _default_system_prompt(self) -> str:
+        return _DEFAULT_SYSTEM_PROMPT
 
     def _parse_grid_command(self, text: str) -> Optional[Dict]:
         """Парсит команды о создании гридов."""
-        import re
-
-        grid_keywords = [
-            r'грид', r'сетк', r'распредел', r'поставь', r'запусти',
-            r'сделай.*монет', r'все по', r'по.*доллар', r'по.*\$',
-            r'докинул', r'пополни', r'баланс', r'закинул', r'кинул',
-            r'проведи.*анализ', r'анализ.*монет', r'стратеги',
-            r'low\s*risk', r'mrisk', r'lrisk', r'hrisk',
-            r'ставь', r'вкинь', r'залей', r'раскидай', r'разбей',
-            r'накинь', r'добавь', r'впиши', r'крипт',
-            r'выбери.*монет', r'выдели', r'распредел.*средств',
-            r'запуск.*бот', r'по всем пар'
-        ]
-
-        has_keyword = any(re.search(kw, text) for kw in grid_keywords)
-        if not has_keyword:
-            return None
-
-        result = {
-            "risk": "MEDIUM",
-            "days": 7,
-            "capital": 50.0,
-            "count": 5
-        }
-
-        amount_match = re.search(
-            r'(?:\$\s*)?(\d+(?:\.\d+)?)\s*(?:долл|usdt|usd|\$|баксов)?',
-            text
-        )
-        if amount_match:
-            amount = float(amount_match.group(1))
-            if amount <= 20:
-                result["capital"] = amount * 5
-                result["per_coin"] = amount
-            else:
-                result["capital"] = amount
-
-        count_match = re.search(r'(\d+)\s*(?:монет|грид|штук|позици)', text)
-        if count_match:
-            result["count"] = int(count_match.group(1))
-
-        if any(w in text for w in ['агрессив', 'рискован', 'высок', 'дерзк', 'жёстк', 'хард', 'hrisk', 'high']):
-            result["risk"] = "HIGH"
-        elif any(w in text for w in ['консерватив', 'осторож', 'низк', 'тих', 'спокойн', 'лайт', 'lrisk', 'low risk', 'low']):
-            result["risk"] = "LOW"
-        elif any(w in text for w in ['mrisk', 'medium', 'средн', 'умерен']):
-            result["risk"] = "MEDIUM"
-
-        action_words = [
-            'сделай', 'поставь', 'запусти', 'распредели', 'докинул', 'пополнил', 'закинул',
-            'кинул', 'вкинул', 'залил', 'раскидай', 'разбей', 'накинь', 'добавь',
-            'впиши', 'ставь', 'вкинь', 'залей', 'накидай', 'разбросай',
-            'проведи', 'выбери', 'выдели', 'анализ', 'запуск',
-            'делай', 'подтверждаю', 'согласен'
-        ]
-        has_action = any(w in text for w in action_words)
-
-        if has_action or 'по' in text and amount_match:
-            return result
-
-        return None
+        # Парсинг детерминирован по тексту — повторные одинаковые
+        # команды берутся из кэша; каждому вызову отдаётся свежий dict
+        cached = _parse_grid_command_cached(text)
+        return dict(cached) if cached is not None else None
 
     def _build_analysis_context(self) -> str:
         """Строит контекст из истории Grid AI анализов для LLM."""
@@ -350,6 +442,13 @@ class TelegramBot:
             if not history:
                 return ""
 
+            # История меняется только после нового анализа — пока
+            # сигнатура та же, возвращаем готовую строку без
+            # переформатирования на каждое сообщение
+            sig = (len(history), history[-1].get("ts"), id(history[-1]))
+            if self._ctx_cache is not None and self._ctx_cache[0] == sig:
+                return self._ctx_cache[1]
+
             lines = ["## РЕЗУЛЬТАТЫ ПОСЛЕДНИХ GRID AI АНАЛИЗОВ\n"]
 
             for i, record in enumerate(history[-3:], 1):
@@ -380,36 +479,102 @@ class TelegramBot:
             lines.append(
                 "Используй эти данные для ответов на вопросы пользователя о монетах и распределении."
             )
-            return "\n".join(lines)
+            context = "\n".join(lines)
+            self._ctx_cache = (sig, context)
+            return context
         except Exception as e:
             self.logger.error("Error building analysis context: %s", e)
             return ""
 
+    # Порог, после которого история читается с конца, и размер блока
+    _TAIL_THRESHOLD = 1_000_000
+    _TAIL_BLOCK = 65536
+
     def _load_history(self) -> None:
         try:
-            with open(self.history_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    parts = line.rstrip("\n").split("\t", 1)
-                    if len(parts) != 2:
-                        continue
-                    role, text = parts
-                    self.history.append((role, text))
-            if len(self.history) > self.max_history:
-                self.history = self.history[-self.max_history:]
-        except FileNotFoundError:
-            pass
-        except Exception as exc:
-            self.logger.error("Failed to load history: %s", exc)
+            size = os.path.getsize(self.history_file)
+        except OSError:
+            return
 
-    def _persist_history(self, role: str, text: str) -> None:
         try:
-            with open(self.history_file, "a", encoding="utf-8") as f:
-                f.write(f"{role}\t{text}\n")
+            if size < self._TAIL_THRESHOLD:
+                with open(self.history_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        parts = line.rstrip("\n").split("\t", 1)
+                        if len(parts) != 2:
+                            continue
+                        role, text = parts
+                        self.history.append((role, text))  # maxlen сам обрежет
+                return
+
+            # Большой файл: нужны только последние max_history строк,
+            # поэтому читаем блоками с конца вместо прохода по всему файлу
+            blocks = []
+            newlines = 0
+            pos = size
+            with open(self.history_file, "rb") as f:
+                while pos > 0 and newlines <= self.max_history:
+                    step = min(self._TAIL_BLOCK, pos)
+                    pos -= step
+                    f.seek(pos)
+                    block = f.read(step)
+                    blocks.append(block)
+                    newlines += block.count(b"\n")
+
+            tail = b"".join(reversed(blocks)).split(b"\n")
+            for raw in tail[-(self.max_history + 1):]:
+                if not raw.strip():
+                    continue
+                parts = raw.decode("utf-8", errors="replace").split("\t", 1)
+                if len(parts) != 2:
+                    continue
+                self.history.append((parts[0], parts[1]))
+        except Exception as exc:
+            logging.getLogger(__name__).error("Failed to load history: %s", exc)
+
+    def _select_context(
+        self, budget_chars: int = 6000, max_messages: int = 80
+    ) -> list[tuple[str, str]]:
+        """
+        Выбирает хвост истории для LLM-контекста по бюджету символов.
+
+        Идём от свежих сообщений к старым, пока не упрёмся в бюджет:
+        пара длинных сообщений не раздувает prefill, как это делал
+        фиксированный срез последних 80 записей. Самое свежее
+        сообщение попадает в контекст всегда.
+        """
+        selected: list[tuple[str, str]] = []
+        used = 0
+        for role, content in reversed(self.history):
+            if selected and (
+                used + len(content) > budget_chars
+                or len(selected) >= max_messages
+            ):
+                break
+            selected.append((role, content))
+            used += len(content)
+        selected.reverse()
+        return selected
+
+    async def _persist_history(self, role: str, text: str) -> None:
+        """Пишет строку истории в thread pool — event loop не ждёт диск."""
+        if self._hist_fp is None:
+            return
+        try:
+            await asyncio.to_thread(self._hist_fp.write, f"{role}\t{text}\n")
         except Exception as exc:
             self.logger.error("Failed to persist history: %s", exc)
 
+    def __del__(self) -> None:
+        fp = getattr(self, "_hist_fp", None)
+        if fp is not None:
+            try:
+                fp.close()
+            except Exception:
+                pass
+
     # ==================== КОМАНДЫ ====================
 
     async def _status_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -420,7 +585,16 @@ class TelegramBot:
         """Показывает реальный баланс аккаунта Gate.io."""
         self.logger.info("INCOMING /balance from %s", update.effective_chat.id)
         try:
-            balances = self.get_all_balances()
+            now = time.monotonic()
+            if (
+                self._balance_cache is not None
+                and now - self._balance_cache[0] < self._balance_ttl
+            ):
+                balances = self._balance_cache[1]
+            else:
+                # to_thread: синхронный запрос балансов не блокирует loop
+                balances = await asyncio.to_thread(self.get_all_balances)
+                self._balance_cache = (time.monotonic(), balances)
             if not balances:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
@@ -428,20 +602,25 @@ class TelegramBot:
                 )
                 return
 
-            lines = ["💰 **Баланс Gate.io:**\n"]
-            total_usdt = 0.0
-            for currency, amount in sorted(balances.items(), key=lambda x: -x[1]):
-                if currency == "USDT":
-                    total_usdt += amount
-                    lines.append(f"• **USDT**: ${amount:.2f}")
-                else:
-                    lines.append(f"• {currency}: {amount:.6f}")
-
-            lines.append(f"\n📊 **Доступно для торговли:** ${total_usdt:.2f}")
+            total_usdt = balances.get("USDT", 0.0)
+            # Один join по генератору вместо наращиваемого списка;
+            # itemgetter — C-реализованный ключ, дешевле лямбды
+            body = "\n".join(
+                f"• **USDT**: ${amount:.2f}"
+                if currency == "USDT"
+                else f"• {currency}: {amount:.6f}"
+                for currency, amount in sorted(
+                    balances.items(), key=itemgetter(1), reverse=True
+                )
+            )
 
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
-                text="\n".join(lines)
+                text=(
+                    "💰 **Баланс Gate.io:**\n\n"
+                    f"{body}\n\n"
+                    f"📊 **Доступно для торговли:** ${total_usdt:.2f}"
+                )
             )
         except Exception as e:
             await context.bot.send_message(
@@ -495,19 +674,17 @@ class TelegramBot:
 
         self.last_free_text = text
         self.history.append(("user", text))
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-        self._persist_history("user", text)
+        await self._persist_history("user", text)
 
         reply = None
         normalized = text.strip().lower()
 
         # Шаг 0: Быстрые команды
-        if normalized in {"старт", "start", "go", "launch"}:
+        if normalized in _START_WORDS:
             reply = self.start_sprint()
-        elif normalized in {"подтвердить", "confirm", "да", "yes", "ок", "ok", "делай", "do"}:
+        elif normalized in _CONFIRM_WORDS:
             reply = self.confirm_order()
-        elif normalized in {"отмена", "cancel", "нет", "no", "стоп", "stop"}:
+        elif normalized in _CANCEL_WORDS:
             reply = self.cancel_order()
 
         # Шаг 1: SmartChatHandler (batch buy, rebalance)
@@ -519,29 +696,35 @@ class TelegramBot:
 
         # Шаг 2: Парсинг buy/sell через regex (fallback)
         if reply is None and self.execute_quick_order:
-            import re
-            buy_words = r'(?:купи|buy|докупи|куплю|добавь)'
-            sell_words = r'(?:продай|sell|продам|слей)'
-            symbol_pattern = r'([a-zA-Z]{2,10})'
-
-            buy_match = re.search(rf'{buy_words}\s+{symbol_pattern}', normalized)
-            sell_match = re.search(rf'{sell_words}\s+{symbol_pattern}', normalized)
-
-            amount_match = re.search(r'\$?(\d+(?:\.\d+)?)', normalized)
-            default_amount = float(amount_match.group(1)) if amount_match else 10.0
-
-            if buy_match:
-                symbol = buy_match.group(1).upper()
-                reply = self.execute_quick_order("buy", symbol, default_amount)
-            elif sell_match:
-                symbol = sell_match.group(1).upper()
-                reply = self.execute_quick_order("sell", symbol, None)
+            buy_symbol = sell_symbol = None
+            amount = None
+            for match in _DISPATCH_RE.finditer(normalized):
+                group = match.lastgroup
+                if group == "bsym" and buy_symbol is None:
+                    buy_symbol = match.group("bsym")
+                elif group == "ssym" and sell_symbol is None:
+                    sell_symbol = match.group("ssym")
+                elif group == "amt" and amount is None:
+                    amount = float(match.group("amt"))
+
+            default_amount = amount if amount is not None else 10.0
+
+            if buy_symbol:
+                reply = self.execute_quick_order("buy", buy_symbol.upper(), default_amount)
+            elif sell_symbol:
+                reply = self.execute_quick_order("sell", sell_symbol.upper(), None)
 
         # Шаг 3: Grid команды
         if reply is None and self.grid_ai_analyze:
             grid_cmd = self._parse_grid_command(normalized)
             if grid_cmd:
-                await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+                # Индикатор набора и сам анализ — независимые I/O,
+                # отправляем конкурентно вместо последовательных await
+                typing_task = asyncio.create_task(
+                    context.bot.send_chat_action(
+                        chat_id=update.effective_chat.id, action="typing"
+                    )
+                )
                 try:
                     result = await asyncio.to_thread(
                         self.grid_ai_analyze,
@@ -553,33 +736,58 @@ class TelegramBot:
                         reply = self.grid_ai_format(result)
                 except Exception as e:
                     self.logger.error("Grid AI error: %s", e)
+                await typing_task
 
         # Шаг 4: LLM fallback
         if reply is None and self.llm_client:
-            await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+            typing_task = asyncio.create_task(
+                context.bot.send_chat_action(
+                    chat_id=update.effective_chat.id, action="typing"
+                )
+            )
 
+            # Системный промпт идёт первым сообщением байт-в-байт
+            # одинаково между запросами — провайдеры с prefix-кэшем
+            # переиспользуют его KV; изменчивый контекст анализов
+            # добавляется отдельным system-сообщением после
+            messages = [{"role": "system", "content": self.system_prompt}]
             analysis_context = self._build_analysis_context()
-            system_content = self.system_prompt
             if analysis_context:
-                system_content += f"\n\n{analysis_context}"
-
-            messages = [{"role": "system", "content": system_content}]
-            for role, content in self.history[-80:]:
+                messages.append({"role": "system", "content": analysis_context})
+            for role, content in self._select_context():
                 messages.append({"role": "assistant" if role == "bot" else "user", "content": content})
 
-            try:
-                reply = await asyncio.to_thread(self.llm_client.chat, messages)
-            except Exception as e:
-                self.logger.error("LLM error: %s", e)
-                reply = f"❌ Ошибка LLM: {e}"
+            # Ключ кэша — весь отправляемый промпт. Короткие повторы
+            # ("почему?", "объясни") зависят от истории диалога, поэтому
+            # ключ без окна _select_context() отдавал бы ответ, посчитанный
+            # для другого разговора. Попадания остаются только при
+            # идентичном контексте (ретраи, дубли доставки) — корректность
+            # важнее hit rate
+            cache_key = hashlib.sha256(
+                json.dumps(messages, sort_keys=True, ensure_ascii=False).encode()
+            ).hexdigest()
+            cached = self._llm_cache.get(cache_key)
+            if cached is not None:
+                self._llm_cache.move_to_end(cache_key)
+                reply = cached
+            else:
+                try:
+                    reply = await asyncio.to_thread(self.llm_client.chat, messages)
+                except Exception as e:
+                    self.logger.error("LLM error: %s", e)
+                    reply = f"❌ Ошибка LLM: {e}"
+                else:
+                    self._llm_cache[cache_key] = reply
+                    if len(self._llm_cache) > self._llm_cache_max:
+                        self._llm_cache.popitem(last=False)
+
+            await typing_task
 
         if not reply:
             reply = f"✅ Принял: {text[:50]}..."
 
         self.history.append(("bot", reply))
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-        self._persist_history("bot", reply)
+        await self._persist_history("bot", reply)
 
         await self._send_split_message(context, update.effective_chat.id, reply)
 
@@ -590,13 +798,11 @@ class TelegramBot:
             await context.bot.send_message(chat_id=chat_id, text=text)
             return
 
-        parts = []
-        remaining = text
-        while len(remaining) > max_len:
-            parts.append(remaining[:max_len])
-            remaining = remaining[max_len:]
-        if remaining:
-            parts.append(remaining)
+        # Срезы по индексу: O(n) суммарно вместо квадратичного
+        # remaining = remaining[max_len:] на длинных ответах.
+        # Отправка остаётся последовательной — Telegram не гарантирует
+        # порядок доставки конкурентных send_message
+        parts = [text[i:i + max_len] for i in range(0, len(text), max_len)]
         for part in parts:
             await context.bot.send_message(chat_id=chat_id, text=part)
 
@@ -632,8 +838,11 @@ class TelegramBot:
             self.logger.warning("Bot token is empty.")
             return
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # PTB v20+ сам создаёт и владеет event loop'ом в run_polling;
+        # свой нужен только в фоновом потоке (start_background), где
+        # get_event_loop() loop автоматически не даёт
+        if threading.current_thread() is not threading.main_thread():
+            asyncio.set_event_loop(asyncio.new_event_loop())
 
         self._app = (
             ApplicationBuilder()